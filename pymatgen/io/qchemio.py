@@ -5,12 +5,13 @@
 This module implements input and output processing from QChem.
 """
 import copy
+import math
 import re
+from itertools import groupby
+from operator import itemgetter
 import numpy as np
-from string import Template
 from monty.io import zopen
-from pymatgen.core.operations import SymmOp
-from pymatgen.core.structure import Molecule
+from pymatgen.core.structure import Molecule, IMolecule
 from pymatgen.core.units import Energy
 from pymatgen.serializers.json_coders import MSONable
 from pymatgen.util.coord_utils import get_angle
@@ -23,6 +24,236 @@ __email__ = "xhqu1981@gmail.com"
 __date__ = "11/4/13"
 
 
+# QChem input is plain ASCII. re.ASCII only exists (and only matters) on
+# Python 3, where it keeps \w, \d and \s off the Unicode tables.
+_ASCII = getattr(re, "ASCII", 0)
+
+_ZMAT_PATT = re.compile(r"^(\w+)*([\s,]+(\w+)[\s,]+(\w+))*[\-\.\s,\w]*$",
+                        _ASCII)
+_XYZ_PATT = re.compile(r"^(\w+)[\s,]+([\d\.eE\-]+)[\s,]+([\d\.eE\-]+)[\s,]+"
+                       r"([\d\.eE\-]+)[\-\.\s,\w.]*$", _ASCII)
+_ZMAT_VAR_PATT = re.compile(r"^([A-Za-z]+\S*)[\s=,]+([\d\-\.]+)$", _ASCII)
+_CHARGE_MULTI_PATT = re.compile(r'\s*(?P<charge>[-+]?\d+)\s+(?P<multi>\d+)')
+_FLOAT_PATT = re.compile(r'^[-+]?\d+\.\d+([eE][-+]?\d+)?$')
+
+_AVAILABLE_JOBTYPES = frozenset(["sp", "opt", "ts", "freq", "force", "rpath",
+                                 "nmr", "bsse", "eda", "pes_scan", "fsm",
+                                 "aimd", "pimc", "makeefp"])
+_AVAILABLE_SCF_ALGORITHMS = frozenset(["diis", "dm", "diis_dm", "diis_gdm",
+                                       "gdm", "rca", "rca_diis", "roothaan"])
+_AVAILABLE_SCF_GUESSES = frozenset(["core", "sad", "gwh", "read", "fragmo"])
+_LEBEDEV_ANGULAR_POINTS = frozenset([6, 18, 26, 38, 50, 74, 86, 110, 146, 170,
+                                     194, 230, 266, 302, 350, 434, 590, 770,
+                                     974, 1202, 1454, 1730, 2030, 2354, 2702,
+                                     3074, 3470, 3890, 4334, 4802, 5294])
+_GEOM_OPT_COORDS_TYPES = {"cartesian": 0, "internal": 1, "internal-switch": -1,
+                          "z-matrix": 2, "z-matrix-switch": -2}
+_REM_PRIORITY_KEYS = ("jobtype", "exchange", "basis")
+_PCM_SOLVENT_PRIORITY_KEYS = ("dielectric", "nonels", "nsolventatoms",
+                              "solventatom")
+
+# Patterns used by QcOutput when scanning a job's output.
+_SCF_ENERGY_PATT = re.compile("Total energy in the final basis set ="
+                              "\s+(?P<energy>-\d+\.\d+)")
+_CORR_ENERGY_PATT = re.compile("(?P<name>[A-Z\-\(\)0-9]+)\s+"
+                               "([tT]otal\s+)?[eE]nergy\s+=\s+"
+                               "(?P<energy>-\d+\.\d+)")
+_OUT_COORD_PATT = re.compile("\s*\d+\s+(?P<element>[A-Z][a-z]*)\s+"
+                             "(?P<x>\-?\d+\.\d+)\s+"
+                             "(?P<y>\-?\d+\.\d+)\s+"
+                             "(?P<z>\-?\d+\.\d+)")
+_NUM_ELE_PATT = re.compile("There are\s+(?P<alpha>\d+)\s+alpha "
+                           "and\s+(?P<beta>\d+)\s+beta electrons")
+_TOTAL_CHARGE_PATT = re.compile("Sum of atomic charges ="
+                                "\s+(?P<charge>\-?\d+\.\d+)")
+_SCF_ITER_PATT = re.compile("\d+\s+(?P<energy>\-\d+\.\d+)\s+"
+                            "(?P<diis_error>\d+\.\d+E[-+]\d+)")
+_ZPE_PATT = re.compile("Zero point vibrational energy:"
+                       "\s+(?P<zpe>\d+\.\d+)\s+kcal/mol")
+_THERMAL_CORR_PATT = re.compile("(?P<name>\S.*\S):\s+"
+                                "(?P<correction>\d+\.\d+)\s+"
+                                "k?cal/mol")
+_DETAILED_CHARGE_PATT = re.compile("Ground-State (?P<method>\w+) Net"
+                                   " Atomic Charges")
+
+# Errors recognized by a fixed piece of text are found with plain substring
+# tests; only the rest need regular expressions.
+_LITERAL_ERRORS = (
+    ("Convergence failure", "Bad SCF convergence"),
+    ("Coordinates do not transform within specified threshold",
+        "autoz error"),
+    ("MAXIMUM OPTIMIZATION CYCLES REACHED", "Geometry optimization failed"),
+    ("Unable to allocate requested memory in mega_alloc",
+        "Insufficient static memory")
+)
+_REGEX_ERRORS = (
+    (re.compile("\s+[Nn][Aa][Nn]\s+"), "NAN values"),
+    (re.compile("energy\s+=\s*(\*)+"), "Numerical disaster"),
+    (re.compile("NewFileMan::OpenFile\(\):\s+nopenfiles=\d+\s+"
+                "maxopenfiles=\d+s+errno=\d+"), "Open file error"),
+    (re.compile("Application \d+ exit codes: 1[34]\d+"), "Exit Code 134"),
+    (re.compile("Negative overlap matrix eigenvalue. Tighten integral "
+                "threshold \(REM_THRESH\)!"), "Negative Eigen"),
+    (re.compile("Application \d+ exit signals: Killed"),
+        "Killed")
+)
+# All regex error patterns fused into one alternation. Nearly every output
+# line matches none of them, so one search rules the line out; the
+# individual patterns only run on the rare hit, which keeps every message a
+# line triggers.
+_REGEX_ERROR_SCREEN = re.compile("|".join(["(?:%s)" % ep.pattern
+                                           for ep, message in _REGEX_ERRORS]))
+
+
+def _cc_converged(line):
+    cc_pos = line.find("CC")
+    return cc_pos >= 0 and "converged" in line[cc_pos + 2:]
+
+
+# Markers whose presence in a job's output shows that a step finished, as
+# (name, test on one line) pairs. QcOutput._expected_successful_pattern
+# picks the names a job needs from this table.
+_SUCCESS_MARKERS = (
+    ("scf_converged", lambda line: "Convergence criterion met" in line),
+    ("cc_converged", _cc_converged),
+    ("opt_converged", lambda line: "OPTIMIZATION CONVERGED" in line),
+    ("vib_analysis", lambda line: "VIBRATIONAL ANALYSIS" in line),
+    ("gradient", lambda line: "Gradient of SCF Energy" in line)
+)
+_RUNNING_JOB_PATT = re.compile("Running Job \d+ of \d+ \S+")
+
+try:
+    _string_types = basestring
+except NameError:
+    # Python 3
+    _string_types = str
+
+
+def _clone_molecule(molecule):
+    """
+    Copy a molecule by rebuilding it from species and coordinates, which is
+    much cheaper than a deepcopy. Only the site properties, whose values
+    may be mutable, are deep-copied. Anything that is not a molecule is
+    deep-copied as before.
+    """
+    if not isinstance(molecule, IMolecule):
+        return copy.deepcopy(molecule)
+    return molecule.__class__(
+        molecule.species_and_occu, molecule.cart_coords,
+        charge=molecule.charge,
+        spin_multiplicity=molecule.spin_multiplicity,
+        site_properties=copy.deepcopy(molecule.site_properties))
+
+
+def _rotate_about_axis(point, origin, axis, angle):
+    """
+    Rotates point by angle (in degrees) about the axis passing through
+    origin, using Rodrigues' rotation formula. Gives the same result as
+    SymmOp.from_origin_axis_angle(origin, axis, angle).operate(point)
+    without building the 4x4 affine matrix.
+    """
+    theta = math.radians(angle)
+    axis = np.asarray(axis, dtype=np.float64)
+    k = axis / math.sqrt(np.dot(axis, axis))
+    v = point - origin
+    cos_t = math.cos(theta)
+    return origin + v * cos_t + np.cross(k, v) * math.sin(theta) \
+        + k * (np.dot(k, v) * (1 - cos_t))
+
+
+def _format_coords(species, coords):
+    """
+    Format the atom lines of a $molecule section.
+
+    All atoms are written with a single %-formatting call on a template
+    covering the whole block, which keeps the per-atom work in C for large
+    molecules (e.g. when writing many MD snapshots).
+
+    Args:
+        species ([str]): Element symbols.
+        coords (Nx3 array): Cartesian coordinates.
+
+    Returns:
+        The atom lines joined by newlines.
+    """
+    values = []
+    for element, xyz in zip(species, np.asarray(coords).tolist()):
+        values.append(element)
+        values.extend(xyz)
+    template = "\n".join([" %-4s %17.8f %17.8f %17.8f"] * len(species))
+    return template % tuple(values)
+
+
+def _coerce_value(v):
+    """
+    Convert a keyword value token from an input section to bool, int or
+    float where it looks like one, and to lower case otherwise.
+    """
+    if v == "True":
+        return True
+    if v == "False":
+        return False
+    # int() alone would also accept digit groups such as "1_0" on Python 3.
+    if "_" not in v:
+        try:
+            return int(v)
+        except ValueError:
+            pass
+    # float() accepts ".5", "5." or "inf", which are kept as strings.
+    if "." in v and _FLOAT_PATT.match(v):
+        return float(v)
+    return v.lower()
+
+
+def _iter_split(text, sep):
+    """
+    Generator equivalent of text.split(sep), yielding one piece at a time
+    instead of building the whole list of pieces up front.
+    """
+    start = 0
+    end = text.find(sep)
+    while end >= 0:
+        yield text[start:end]
+        start = end + len(sep)
+        end = text.find(sep, start)
+    yield text[start:]
+
+
+def _iter_job_lines(f):
+    """
+    Yield (job_index, line) for every line of a QChem output file, without
+    line terminators. Jobs are delimited exactly as
+    re.split("\\n\\nRunning Job \\d+ of \\d+ \\S+", f.read()) would
+    delimit them, but only one line is held in memory at a time.
+    """
+    job = 0
+    blank = None
+    raw = None
+    for i, raw in enumerate(f):
+        if not isinstance(raw, _string_types):
+            # Compressed files yield bytes under Python 3.
+            raw = raw.decode("utf-8")
+        line = raw[:-1] if raw.endswith("\n") else raw
+        if blank is not None:
+            m = _RUNNING_JOB_PATT.match(line)
+            blank = None
+            if m:
+                job += 1
+                yield job, line[m.end():]
+                continue
+            yield job, ""
+        if not line and i > 0:
+            # Hold back the blank line until we know whether it belongs to
+            # a job separator.
+            blank = line
+        else:
+            yield job, line
+    if blank is not None:
+        yield job, blank
+    if raw is None or raw.endswith("\n"):
+        yield job, ""
+
+
 class QcTask(MSONable):
     """
     An object representing a QChem input file.
@@ -70,28 +301,27 @@ class QcTask(MSONable):
             "F": "aug-cc-PVTZ"} "ecp": {"Cd": "srsc", "Br": "srlc"}}
     """
 
-    optional_keywords_list = {"basis", "ecp", "empirical_dispersion",
-                              "external_charges", "force_field_params",
-                              "intracule", "isotopes", "aux_basis",
-                              "localized_diabatization", "multipole_field",
-                              "nbo", "occupied", "swap_occupied_virtual", "opt",
-                              "pcm", "pcm_solvent", "plots", "qm_atoms", "svp",
-                              "svpirf", "van_der_waals", "xc_functional",
-                              "cdft", "efp_fragments", "efp_params"}
+    optional_keywords_list = frozenset([
+        "basis", "ecp", "empirical_dispersion", "external_charges",
+        "force_field_params", "intracule", "isotopes", "aux_basis",
+        "localized_diabatization", "multipole_field", "nbo", "occupied",
+        "swap_occupied_virtual", "opt", "pcm", "pcm_solvent", "plots",
+        "qm_atoms", "svp", "svpirf", "van_der_waals", "xc_functional",
+        "cdft", "efp_fragments", "efp_params"])
     alternative_keys = {"job_type": "jobtype",
                         "symmetry_ignore": "sym_ignore",
                         "scf_max_cycles": "max_scf_cycles"}
     alternative_values = {"optimization": "opt",
                           "frequency": "freq"}
-    zmat_patt = re.compile("^(\w+)*([\s,]+(\w+)[\s,]+(\w+))*[\-\.\s,\w]*$")
-    xyz_patt = re.compile("^(\w+)[\s,]+([\d\.eE\-]+)[\s,]+([\d\.eE\-]+)[\s,]+"
-                          "([\d\.eE\-]+)[\-\.\s,\w.]*$")
+    _section_order = ("comment", "molecule", "rem") + \
+        tuple(sorted(optional_keywords_list))
+    _available_sections = frozenset(_section_order)
 
     def __init__(self, molecule=None, charge=None, spin_multiplicity=None,
                  jobtype='SP', title=None, exchange="HF", correlation=None,
                  basis_set="6-31+G*", aux_basis_set=None, ecp=None,
                  rem_params=None, optional_params=None):
-        self.mol = copy.deepcopy(molecule) if molecule else "read"
+        self.mol = _clone_molecule(molecule) if molecule else "read"
         if isinstance(self.mol, str):
             self.mol = self.mol.lower()
         self.charge = charge
@@ -120,19 +350,16 @@ class QcTask(MSONable):
         if "rem" not in self.params:
             self.params["rem"] = dict()
         self.params["rem"]["exchange"] = exchange.lower()
-        available_jobtypes = {"sp", "opt", "ts", "freq", "force", "rpath",
-                              "nmr", "bsse", "eda", "pes_scan", "fsm", "aimd",
-                              "pimc", "makeefp"}
         jt = jobtype.lower()
         if jt in self.alternative_values:
             jt = self.alternative_values[jt]
-        if jt not in available_jobtypes:
+        if jt not in _AVAILABLE_JOBTYPES:
             raise ValueError("Job type " + jobtype + " is not supported yet")
-        self.params["rem"]["jobtype"] = jobtype.lower()
+        self.params["rem"]["jobtype"] = jt
         if correlation is not None:
             self.params["rem"]["correlation"] = correlation.lower()
         if rem_params is not None:
-            for k, v in rem_params.iteritems():
+            for k, v in rem_params.items():
                 k = k.lower()
                 if k in self.alternative_keys:
                     k = self.alternative_keys[k]
@@ -147,9 +374,9 @@ class QcTask(MSONable):
                     raise ValueError("The value in $rem can only be Integer "
                                      "or string")
         if optional_params:
-            op_key = set([k.lower() for k in optional_params.keys()])
-            if len(op_key - self.optional_keywords_list) > 0:
-                invalid_keys = op_key - self.optional_keywords_list
+            invalid_keys = {k.lower() for k in optional_params}.difference(
+                self.optional_keywords_list)
+            if invalid_keys:
                 raise ValueError(','.join(['$' + k for k in invalid_keys]) +
                                  'is not a valid optional section')
             self.params.update(optional_params)
@@ -178,28 +405,42 @@ class QcTask(MSONable):
             if self.params["rem"]["correlation"].startswith("ri"):
                 return True
 
+    def _validate_element_coverage(self, provided, label,
+                                   require_all_mol=True):
+        """
+        Check the elements of a per-element setting against the molecule.
+
+        Args:
+            provided (dict): Per-element setting keyed by element symbol.
+            label (str): Name of the setting used in error messages.
+            require_all_mol (bool): Whether every element of the molecule
+                must be present in provided.
+        """
+        if not self.mol:
+            return
+        mol_elements = frozenset(site.species_string for site
+                                 in self.mol.sites)
+        if require_all_mol:
+            missing = mol_elements.difference(provided)
+            if missing:
+                raise ValueError("The " + label + " for elements " +
+                                 ", ".join(sorted(missing)) + " is missing")
+        extra = frozenset(provided) - mol_elements
+        if extra:
+            raise ValueError(label[0].upper() + label[1:] + " error: the "
+                             "molecule doesn't contain element " +
+                             ", ".join(sorted(extra)))
+
     def set_basis_set(self, basis_set):
-        if isinstance(basis_set, str) or isinstance(basis_set, unicode):
+        if isinstance(basis_set, _string_types):
             self.params["rem"]["basis"] = str(basis_set).lower()
         elif isinstance(basis_set, dict):
             self.params["rem"]["basis"] = "gen"
             bs = dict()
-            for element, basis in basis_set.iteritems():
+            for element, basis in basis_set.items():
                 bs[element.strip().capitalize()] = basis.lower()
             self.params["basis"] = bs
-            if self.mol:
-                mol_elements = set([site.species_string for site
-                                    in self.mol.sites])
-                basis_elements = set(self.params["basis"].keys())
-                if len(mol_elements - basis_elements) > 0:
-                    raise ValueError("The basis set for elements " +
-                                     ", ".join(
-                                         list(mol_elements - basis_elements)) +
-                                     " is missing")
-                if len(basis_elements - mol_elements) > 0:
-                    raise ValueError("Basis set error: the molecule "
-                                     "doesn't contain element " +
-                                     ", ".join(basis_elements - mol_elements))
+            self._validate_element_coverage(bs, "basis set")
         else:
             raise Exception('Can\'t handle type "{}"'.format(type(basis_set)))
 
@@ -209,23 +450,10 @@ class QcTask(MSONable):
         elif isinstance(aux_basis_set, dict):
             self.params["rem"]["aux_basis"] = "gen"
             bs = dict()
-            for element, basis in aux_basis_set.iteritems():
+            for element, basis in aux_basis_set.items():
                 bs[element.strip().capitalize()] = basis.lower()
             self.params["aux_basis"] = bs
-            if self.mol:
-                mol_elements = set([site.species_string for site
-                                    in self.mol.sites])
-                basis_elements = set(self.params["aux_basis"].keys())
-                if len(mol_elements - basis_elements) > 0:
-                    raise ValueError("The auxiliary basis set for "
-                                     "elements " +
-                                     ", ".join(
-                                         list(mol_elements - basis_elements)) +
-                                     " is missing")
-                if len(basis_elements - mol_elements) > 0:
-                    raise ValueError("Auxiliary asis set error: the "
-                                     "molecule doesn't contain element " +
-                                     ", ".join(basis_elements - mol_elements))
+            self._validate_element_coverage(bs, "auxiliary basis set")
 
     def set_ecp(self, ecp):
         if isinstance(ecp, str):
@@ -233,17 +461,11 @@ class QcTask(MSONable):
         elif isinstance(ecp, dict):
             self.params["rem"]["ecp"] = "gen"
             potentials = dict()
-            for element, p in ecp.iteritems():
+            for element, p in ecp.items():
                 potentials[element.strip().capitalize()] = p.lower()
             self.params["ecp"] = potentials
-            if self.mol:
-                mol_elements = set([site.species_string for site
-                                    in self.mol.sites])
-                ecp_elements = set(self.params["ecp"].keys())
-                if len(ecp_elements - mol_elements) > 0:
-                    raise ValueError("ECP error: the molecule "
-                                     "doesn't contain element " +
-                                     ", ".join(ecp_elements - mol_elements))
+            self._validate_element_coverage(potentials, "ECP",
+                                            require_all_mol=False)
 
     @property
     def molecule(self):
@@ -285,9 +507,7 @@ class QcTask(MSONable):
             algorithm: The algorithm used for converging SCF. (str)
             iterations: The max number of SCF iterations. (Integer)
         """
-        available_algorithms = {"diis", "dm", "diis_dm", "diis_gdm", "gdm",
-                                "rca", "rca_diis", "roothaan"}
-        if algorithm.lower() not in available_algorithms:
+        if algorithm.lower() not in _AVAILABLE_SCF_ALGORITHMS:
             raise ValueError("Algorithm " + algorithm +
                              " is not available in QChem")
         self.params["rem"]["scf_algorithm"] = algorithm.lower()
@@ -332,17 +552,12 @@ class QcTask(MSONable):
                 SG-1 and SG-0. The other two supported grids are "Lebedev" and
                 "Gauss-Legendre"
         """
-        available_lebedev_angular_points = {6, 18, 26, 38, 50, 74, 86, 110, 146,
-                                            170, 194, 230, 266, 302, 350, 434,
-                                            590, 770, 974, 1202, 1454, 1730,
-                                            2030, 2354, 2702, 3074, 3470, 3890,
-                                            4334, 4802, 5294}
         if grid_type.lower() == "sg-0":
             self.params["rem"]["xc_grid"] = 0
         elif grid_type.lower() == "sg-1":
             self.params["rem"]["xc_grid"] = 1
         elif grid_type.lower() == "lebedev":
-            if angular_points not in available_lebedev_angular_points:
+            if angular_points not in _LEBEDEV_ANGULAR_POINTS:
                 raise ValueError(str(angular_points) + " is not a valid "
                                  "Lebedev angular points number")
             self.params["rem"]["xc_grid"] = "{rp:06d}{ap:06d}".format(
@@ -361,8 +576,7 @@ class QcTask(MSONable):
         Args:
             guess: The initial guess method. (str)
         """
-        availabel_guesses = {"core", "sad", "gwh", "read", "fragmo"}
-        if guess.lower() not in availabel_guesses:
+        if guess.lower() not in _AVAILABLE_SCF_GUESSES:
             raise ValueError("The guess method " + guess + " is not supported "
                                                            "yet")
         self.params["rem"]["scf_guess"] = guess.lower()
@@ -391,14 +605,11 @@ class QcTask(MSONable):
         Args:
             coords_type: The type of the coordinates. (str)
         """
-        coords_map = {"cartesian": 0, "internal": 1, "internal-switch": -1,
-                      "z-matrix": 2, "z-matrix-switch": -2}
-        if coords_type.lower() not in set(coords_map.keys()):
+        ct = coords_type.lower()
+        if ct not in _GEOM_OPT_COORDS_TYPES:
             raise ValueError("Coodinate system " + coords_type + " is not "
                              "supported yet")
-        else:
-            self.params["rem"]["geom_opt_coords"] = \
-                coords_map[coords_type.lower()]
+        self.params["rem"]["geom_opt_coords"] = _GEOM_OPT_COORDS_TYPES[ct]
 
     def scale_geom_opt_threshold(self, gradient=0.1, displacement=0.1,
                                  energy=0.1):
@@ -474,137 +685,118 @@ class QcTask(MSONable):
         if not solvent_params:
             solvent_params = {"Dielectric": 78.3553}
         if pcm_params:
-            for k, v in pcm_params.iteritems():
+            for k, v in pcm_params.items():
                 self.params["pcm"][k.lower()] = v.lower() \
                     if isinstance(v, str) else v
 
-        for k, v in default_pcm_params.iteritems():
-            if k.lower() not in self.params["pcm"].keys():
+        for k, v in default_pcm_params.items():
+            if k.lower() not in self.params["pcm"]:
                 self.params["pcm"][k.lower()] = v.lower() \
                     if isinstance(v, str) else v
-        for k, v in solvent_params.iteritems():
-            self.params["pcm_solvent"][k.lower()] = v.lower() \
-                if isinstance(v, str) else copy.deepcopy(v)
+        for k, v in solvent_params.items():
+            if isinstance(v, str):
+                v = v.lower()
+            elif isinstance(v, (list, tuple)):
+                # Only the SolventAtom rows are mutable; scalars are shared.
+                # Containers are copied with the type the caller passed.
+                v = type(v)(type(row)(row) if isinstance(row, (list, tuple))
+                            else row for row in v)
+            elif isinstance(v, dict):
+                v = dict(v)
+            self.params["pcm_solvent"][k.lower()] = v
         self.params["rem"]["solvent_method"] = "pcm"
         if radii_force_field:
             self.params["pcm"]["radii"] = "bondi"
             self.params["rem"]["force_fied"] = radii_force_field.lower()
 
     def __str__(self):
-        sections = ["comment", "molecule", "rem"] + \
-            sorted(list(self.optional_keywords_list))
         lines = []
-        for sec in sections:
+        for sec in self._section_order:
             if sec in self.params or sec == "molecule":
-                foramt_sec = self.__getattribute__("_format_" + sec)
+                format_sec = self._section_formatters.get(sec)
+                if format_sec is None:
+                    raise Exception("_format_" + sec + " is not implemented "
+                                    "yet, please implement it")
                 lines.append("$" + sec)
-                lines.extend(foramt_sec())
+                format_sec(self, lines)
                 lines.append("$end")
                 lines.append('\n')
         return '\n'.join(lines)
 
-    def _format_comment(self):
-        lines = [' ' + self.params["comment"].strip()]
-        return lines
+    def _format_comment(self, lines):
+        lines.append(' ' + self.params["comment"].strip())
 
-    def _format_molecule(self):
-        lines = []
+    def _format_molecule(self, lines):
         if self.charge is not None:
             lines.append(" {charge:d}  {multi:d}".format(charge=self
                          .charge, multi=self.spin_multiplicity))
         if isinstance(self.mol, str) and self.mol == "read":
             lines.append(" read")
         else:
-            for site in self.mol.sites:
-                lines.append(" {element:<4} {x:>17.8f} {y:>17.8f} "
-                             "{z:>17.8f}".format(element=site.species_string,
-                                                 x=site.x, y=site.y, z=site.z))
-        return lines
-
-    def _format_rem(self):
-        rem_format_template = Template("  {name:>$name_width} = "
-                                       "{value}")
-        name_width = 0
-        for name, value in self.params["rem"].iteritems():
-            if len(name) > name_width:
-                name_width = len(name)
-        rem = rem_format_template.substitute(name_width=name_width)
-        lines = []
-        all_keys = set(self.params["rem"].keys())
-        priority_keys = ["jobtype", "exchange", "basis"]
-        additional_keys = all_keys - set(priority_keys)
-        ordered_keys = priority_keys + sorted(list(additional_keys))
+            species = [site.species_string for site in self.mol.sites]
+            if species:
+                lines.append(_format_coords(species, self.mol.cart_coords))
+
+    def _format_rem(self, lines):
+        name_width = max(map(len, self.params["rem"])) \
+            if self.params["rem"] else 0
+        rem = "  %%%ds = %%s" % name_width
+        ordered_keys = list(_REM_PRIORITY_KEYS)
+        ordered_keys.extend(sorted(k for k in self.params["rem"]
+                                   if k not in _REM_PRIORITY_KEYS))
         for name in ordered_keys:
             value = self.params["rem"][name]
-            lines.append(rem.format(name=name, value=value))
-        return lines
+            lines.append(rem % (name, value))
 
-    def _format_basis(self):
-        lines = []
-        for element in sorted(self.params["basis"].keys()):
-            basis = self.params["basis"][element]
-            lines.append(" " + element)
-            lines.append(" " + basis)
-            lines.append(" ****")
-        return lines
-
-    def _format_aux_basis(self):
-        lines = []
-        for element in sorted(self.params["aux_basis"].keys()):
-            basis = self.params["aux_basis"][element]
-            lines.append(" " + element)
-            lines.append(" " + basis)
-            lines.append(" ****")
-        return lines
-
-    def _format_ecp(self):
-        lines = []
-        for element in sorted(self.params["ecp"].keys()):
-            ecp = self.params["ecp"][element]
-            lines.append(" " + element)
-            lines.append(" " + ecp)
-            lines.append(" ****")
-        return lines
-
-    def _format_pcm(self):
-        pcm_format_template = Template("  {name:>$name_width}   "
-                                       "{value}")
-        name_width = 0
-        for name in self.params["pcm"].keys():
-            if len(name) > name_width:
-                name_width = len(name)
-        rem = pcm_format_template.substitute(name_width=name_width)
-        lines = []
-        for name in sorted(self.params["pcm"].keys()):
+    def _format_per_element(self, section, lines):
+        # One pre-joined block per element, i.e. element, value and "****"
+        # on their own lines.
+        d = self.params[section]
+        lines.extend([" %s\n %s\n ****" % (element, d[element])
+                      for element in sorted(d)])
+
+    def _format_basis(self, lines):
+        self._format_per_element("basis", lines)
+
+    def _format_aux_basis(self, lines):
+        self._format_per_element("aux_basis", lines)
+
+    def _format_ecp(self, lines):
+        self._format_per_element("ecp", lines)
+
+    def _format_pcm(self, lines):
+        name_width = max(map(len, self.params["pcm"])) \
+            if self.params["pcm"] else 0
+        rem = "  %%%ds   %%s" % name_width
+        for name in sorted(self.params["pcm"]):
             value = self.params["pcm"][name]
-            lines.append(rem.format(name=name, value=value))
-        return lines
-
-    def _format_pcm_solvent(self):
-        pp_format_template = Template("  {name:>$name_width}   "
-                                      "{value}")
-        name_width = 0
-        for name in self.params["pcm_solvent"].keys():
-            if len(name) > name_width:
-                name_width = len(name)
-        rem = pp_format_template.substitute(name_width=name_width)
-        lines = []
-        all_keys = set(self.params["pcm_solvent"].keys())
-        priority_keys = []
-        for k in ["dielectric", "nonels", "nsolventatoms", "solventatom"]:
-            if k in all_keys:
-                priority_keys.append(k)
-        additional_keys = all_keys - set(priority_keys)
-        ordered_keys = priority_keys + sorted(list(additional_keys))
+            lines.append(rem % (name, value))
+
+    def _format_pcm_solvent(self, lines):
+        name_width = max(map(len, self.params["pcm_solvent"])) \
+            if self.params["pcm_solvent"] else 0
+        rem = "  %%%ds   %%s" % name_width
+        ordered_keys = [k for k in _PCM_SOLVENT_PRIORITY_KEYS
+                        if k in self.params["pcm_solvent"]]
+        ordered_keys.extend(sorted(k for k in self.params["pcm_solvent"]
+                                   if k not in _PCM_SOLVENT_PRIORITY_KEYS))
         for name in ordered_keys:
             value = self.params["pcm_solvent"][name]
             if name == "solventatom":
-                for v in copy.deepcopy(value):
-                    value = "{:<4d} {:<4d} {:<4d} {:4.2f}".format(*v)
-                    lines.append(rem.format(name=name, value=value))
+                for v in value:
+                    value = "%-4d %-4d %-4d %4.2f" % tuple(v)
+                    lines.append(rem % (name, value))
                 continue
-            lines.append(rem.format(name=name, value=value))
-        return lines
+            lines.append(rem % (name, value))
+
+    _section_formatters = {"comment": _format_comment,
+                           "molecule": _format_molecule,
+                           "rem": _format_rem,
+                           "basis": _format_basis,
+                           "aux_basis": _format_aux_basis,
+                           "ecp": _format_ecp,
+                           "pcm": _format_pcm,
+                           "pcm_solvent": _format_pcm_solvent}
 
     @property
     def to_dict(self):
@@ -628,7 +820,7 @@ class QcTask(MSONable):
         aux_basis_set = d["params"]["rem"].get("aux_basis", None)
         ecp = d["params"]["rem"].get("ecp", None)
         optional_params = None
-        op_keys = set(d["params"].keys()) - {"comment", "rem"}
+        op_keys = set(d["params"]) - {"comment", "rem"}
         if len(op_keys) > 0:
             optional_params = dict()
             for k in op_keys:
@@ -641,9 +833,68 @@ class QcTask(MSONable):
                       ecp=ecp, rem_params=d["params"]["rem"],
                       optional_params=optional_params)
 
+    @classmethod
+    def batch_from_molecules(cls, molecules, charges=None,
+                             spin_multiplicities=None, **kwargs):
+        """
+        Creates a QcTask for each of many molecules with the same settings.
+        The charge/spin multiplicity combinations of all molecules are
+        checked together before any task is built, so an invalid batch fails
+        fast with all the offending indices instead of at the first bad
+        task. This is a convenience, not a shortcut: each task still
+        validates its own combination again in __init__.
+
+        Args:
+            molecules ([Molecule]): The input molecules.
+            charges ([int]): Charge of each molecule. Defaults to None, which
+                means the charge on each molecule is used. Individual
+                entries may also be None.
+            spin_multiplicities ([int]): Spin multiplicity of each molecule.
+                Defaults to None, which means it is derived from the number
+                of electrons as in QcTask. Individual entries may also be
+                None.
+            \*\*kwargs: Other QcTask arguments, shared by all tasks.
+
+        Returns:
+            [QcTask]
+        """
+        n = len(molecules)
+        if charges is None:
+            charges = [None] * n
+        if len(charges) != n or (spin_multiplicities is not None and
+                                 len(spin_multiplicities) != n):
+            raise ValueError("The number of charges and spin multiplicities "
+                             "must match the number of molecules")
+        charges = [m.charge if c is None else c
+                   for m, c in zip(molecules, charges)]
+        if spin_multiplicities is None:
+            spin_multiplicities = [None] * n
+        checked = [i for i, s in enumerate(spin_multiplicities)
+                   if s is not None]
+        if checked:
+            spins = np.array([spin_multiplicities[i] for i in checked],
+                             dtype=float)
+            nelectrons = np.array([molecules[i].charge +
+                                   molecules[i].nelectrons - charges[i]
+                                   for i in checked], dtype=float)
+            invalid = np.nonzero((nelectrons + spins) % 2 != 1)[0]
+            if len(invalid) > 0:
+                raise ValueError("Charge and spin multiplicity are not "
+                                 "possible for molecules at index " +
+                                 ", ".join([str(checked[i])
+                                            for i in invalid]))
+        return [cls(molecule=m, charge=c, spin_multiplicity=s, **kwargs)
+                for m, c, s in zip(molecules, charges, spin_multiplicities)]
+
+    def write_to(self, f):
+        """
+        Writes the input text of this task to an open file object.
+        """
+        f.write(self.__str__())
+
     def write_file(self, filename):
         with zopen(filename, "w") as f:
-            f.write(self.__str__())
+            self.write_to(f)
 
     @classmethod
     def from_file(cls, filename):
@@ -681,24 +932,22 @@ class QcTask(MSONable):
             if l.startswith("$") and not parse_section:
                 parse_section = True
                 section_name = l[1:]
-                available_sections = ["comment", "molecule", "rem"] + \
-                    sorted(list(cls.optional_keywords_list))
-                if section_name not in available_sections:
+                if section_name not in cls._available_sections:
                     raise ValueError("Unrecognized keyword " + line.strip() +
                                      " at line " + str(line_num))
                 if section_name in params:
                     raise ValueError("duplicated keyword " + line.strip() +
                                      "at line " + str(line_num))
             if parse_section and l == "$end":
-                func_name = "_parse_" + section_name
-                if func_name not in QcTask.__dict__:
-                    raise Exception(func_name + " is not implemented yet, "
-                                    "please implement it")
-                parse_func = QcTask.__dict__[func_name].__get__(None, QcTask)
+                parse_func = cls._section_parsers.get(section_name)
+                if parse_func is None:
+                    raise Exception("_parse_" + section_name + " is not "
+                                    "implemented yet, please implement it")
                 if section_name == "molecule":
-                    mol, charge, spin_multiplicity = parse_func(section_text)
+                    mol, charge, spin_multiplicity = parse_func(cls,
+                                                                section_text)
                 else:
-                    d = parse_func(section_text)
+                    d = parse_func(cls, section_text)
                     params[section_name] = d
                 parse_section = False
                 section_name = None
@@ -714,7 +963,7 @@ class QcTask(MSONable):
         aux_basis_set = params["rem"].get("aux_basis", None)
         ecp = params["rem"].get("ecp", None)
         optional_params = None
-        op_keys = set(params.keys()) - {"comment", "rem"}
+        op_keys = set(params) - {"comment", "rem"}
         if len(op_keys) > 0:
             optional_params = dict()
             for k in op_keys:
@@ -737,9 +986,11 @@ class QcTask(MSONable):
         Helper method to parse coordinates. Copied from GaussianInput class.
         """
         paras = {}
-        var_pattern = re.compile("^([A-Za-z]+\S*)[\s=,]+([\d\-\.]+)$")
+        var_match = _ZMAT_VAR_PATT.match
+        xyz_match = _XYZ_PATT.match
+        zmat_match = _ZMAT_PATT.match
         for l in coord_lines:
-            m = var_pattern.match(l.strip())
+            m = var_match(l.strip())
             if m:
                 paras[m.group(1)] = float(m.group(2))
 
@@ -752,17 +1003,17 @@ class QcTask(MSONable):
             l = l.strip()
             if not l:
                 break
-            if (not zmode) and cls.xyz_patt.match(l):
-                m = cls.xyz_patt.match(l)
+            m = None if zmode else xyz_match(l)
+            if m:
                 species.append(m.group(1))
-                toks = re.split("[,\s]+", l.strip())
-                if len(toks) > 4:
-                    coords.append(map(float, toks[2:5]))
-                else:
-                    coords.append(map(float, toks[1:4]))
-            elif cls.zmat_patt.match(l):
+                toks = l.split() if "," not in l \
+                    else l.replace(",", " ").split()
+                coords.append(np.array(toks[2:5] if len(toks) > 4
+                                       else toks[1:4], dtype=np.float64))
+            elif zmat_match(l):
                 zmode = True
-                toks = re.split("[,\s]+", l.strip())
+                toks = l.split() if "," not in l \
+                    else l.replace(",", " ").split()
                 species.append(toks[0])
                 toks.pop(0)
                 if len(toks) == 0:
@@ -787,18 +1038,18 @@ class QcTask(MSONable):
                                 parameters.append(paras[data])
                     if len(nn) == 1:
                         coords.append(np.array(
-                            [0.0, 0.0, float(parameters[0])]))
+                            [0.0, 0.0, parameters[0]], dtype=np.float64))
                     elif len(nn) == 2:
                         coords1 = coords[nn[0] - 1]
                         coords2 = coords[nn[1] - 1]
                         bl = parameters[0]
                         angle = parameters[1]
                         axis = [0, 1, 0]
-                        op = SymmOp.from_origin_axis_angle(coords1, axis,
-                                                           angle, False)
-                        coord = op.operate(coords2)
+                        coord = _rotate_about_axis(coords2, coords1, axis,
+                                                   angle)
                         vec = coord - coords1
-                        coord = vec * bl / np.linalg.norm(vec) + coords1
+                        coord = vec * bl / math.sqrt(np.dot(vec, vec)) \
+                            + coords1
                         coords.append(coord)
                     elif len(nn) == 3:
                         coords1 = coords[nn[0] - 1]
@@ -810,19 +1061,18 @@ class QcTask(MSONable):
                         v1 = coords3 - coords2
                         v2 = coords1 - coords2
                         axis = np.cross(v1, v2)
-                        op = SymmOp.from_origin_axis_angle(
-                            coords1, axis, angle, False)
-                        coord = op.operate(coords2)
+                        coord = _rotate_about_axis(coords2, coords1, axis,
+                                                   angle)
                         v1 = coord - coords1
                         v2 = coords1 - coords2
                         v3 = np.cross(v1, v2)
                         adj = get_angle(v3, axis)
                         axis = coords1 - coords2
-                        op = SymmOp.from_origin_axis_angle(
-                            coords1, axis, dih - adj, False)
-                        coord = op.operate(coord)
+                        coord = _rotate_about_axis(coord, coords1, axis,
+                                                   dih - adj)
                         vec = coord - coords1
-                        coord = vec * bl / np.linalg.norm(vec) + coords1
+                        coord = vec * bl / math.sqrt(np.dot(vec, vec)) \
+                            + coords1
                         coords.append(coord)
 
         def parse_species(sp_str):
@@ -839,21 +1089,18 @@ class QcTask(MSONable):
                 sp = re.sub("\d", "", sp_str)
                 return sp.capitalize()
 
-        species = map(parse_species, species)
+        species = [parse_species(sp) for sp in species]
 
         return Molecule(species, coords)
 
     @classmethod
     def _parse_molecule(cls, contents):
-        text = copy.deepcopy(contents[:2])
-        charge_multi_pattern = re.compile('\s*(?P<charge>'
-                                          '[-+]?\d+)\s+(?P<multi>\d+)')
-        line = text.pop(0)
-        m = charge_multi_pattern.match(line)
+        line = contents[0]
+        m = _CHARGE_MULTI_PATT.match(line)
         if m:
             charge = int(m.group("charge"))
             spin_multiplicity = int(m.group("multi"))
-            line = text.pop(0)
+            line = contents[1]
         else:
             charge = None
             spin_multiplicity = None
@@ -869,9 +1116,6 @@ class QcTask(MSONable):
     @classmethod
     def _parse_rem(cls, contents):
         d = dict()
-        int_pattern = re.compile('^[-+]?\d+$')
-        float_pattern = re.compile('^[-+]?\d+\.\d+([eE][-+]?\d+)?$')
-
         for line in contents:
             tokens = line.strip().replace("=", ' ').split()
             if len(tokens) < 2:
@@ -879,63 +1123,39 @@ class QcTask(MSONable):
                                  "at least two field: key and value!")
             k1, v = tokens[:2]
             k2 = k1.lower()
-            if k2 in cls.alternative_keys:
-                k2 = cls.alternative_keys[k2]
-            if v in cls.alternative_values:
-                v = cls.alternative_values
+            k2 = cls.alternative_keys.get(k2, k2)
+            v = cls.alternative_values.get(v.lower(), v)
             if k2 == "xc_grid":
                 d[k2] = v
-            elif v == "True":
-                d[k2] = True
-            elif v == "False":
-                d[k2] = False
-            elif int_pattern.match(v):
-                d[k2] = int(v)
-            elif float_pattern.match(v):
-                d[k2] = float(v)
             else:
-                d[k2] = v.lower()
+                d[k2] = _coerce_value(v)
         return d
 
     @classmethod
-    def _parse_aux_basis(cls, contents):
+    def _parse_per_element(cls, contents, label):
         if len(contents) % 3 != 0:
-            raise ValueError("Auxiliary basis set section format error")
-        chunks = zip(*[iter(contents)]*3)
+            raise ValueError("%s section format error" % label)
         d = dict()
-        for ch in chunks:
-            element, basis = ch[:2]
-            d[element.strip().capitalize()] = basis.strip().lower()
+        for i in range(0, len(contents), 3):
+            d[contents[i].strip().capitalize()] = \
+                contents[i + 1].strip().lower()
         return d
 
+    @classmethod
+    def _parse_aux_basis(cls, contents):
+        return cls._parse_per_element(contents, "Auxiliary basis set")
+
     @classmethod
     def _parse_basis(cls, contents):
-        if len(contents) % 3 != 0:
-            raise ValueError("Basis set section format error")
-        chunks = zip(*[iter(contents)]*3)
-        d = dict()
-        for ch in chunks:
-            element, basis = ch[:2]
-            d[element.strip().capitalize()] = basis.strip().lower()
-        return d
+        return cls._parse_per_element(contents, "Basis set")
 
     @classmethod
     def _parse_ecp(cls, contents):
-        if len(contents) % 3 != 0:
-            raise ValueError("ECP section format error")
-        chunks = zip(*[iter(contents)]*3)
-        d = dict()
-        for ch in chunks:
-            element, ecp = ch[:2]
-            d[element.strip().capitalize()] = ecp.strip().lower()
-        return d
+        return cls._parse_per_element(contents, "ECP")
 
     @classmethod
     def _parse_pcm(cls, contents):
         d = dict()
-        int_pattern = re.compile('^[-+]?\d+$')
-        float_pattern = re.compile('^[-+]?\d+\.\d+([eE][-+]?\d+)?$')
-
         for line in contents:
             tokens = line.strip().replace("=", ' ').split()
             if len(tokens) < 2:
@@ -943,28 +1163,14 @@ class QcTask(MSONable):
                                  "at least two field: key and value!")
             k1, v = tokens[:2]
             k2 = k1.lower()
-            if k2 in cls.alternative_keys:
-                k2 = cls.alternative_keys[k2]
-            if v in cls.alternative_values:
-                v = cls.alternative_values
-            if v == "True":
-                d[k2] = True
-            elif v == "False":
-                d[k2] = False
-            elif int_pattern.match(v):
-                d[k2] = int(v)
-            elif float_pattern.match(v):
-                d[k2] = float(v)
-            else:
-                d[k2] = v.lower()
+            k2 = cls.alternative_keys.get(k2, k2)
+            v = cls.alternative_values.get(v.lower(), v)
+            d[k2] = _coerce_value(v)
         return d
 
     @classmethod
     def _parse_pcm_solvent(cls, contents):
         d = dict()
-        int_pattern = re.compile('^[-+]?\d+$')
-        float_pattern = re.compile('^[-+]?\d+\.\d+([eE][-+]?\d+)?$')
-
         for line in contents:
             tokens = line.strip().replace("=", ' ').split()
             if len(tokens) < 2:
@@ -973,10 +1179,8 @@ class QcTask(MSONable):
                                  "key and value!")
             k1, v = tokens[:2]
             k2 = k1.lower()
-            if k2 in cls.alternative_keys:
-                k2 = cls.alternative_keys[k2]
-            if v in cls.alternative_values:
-                v = cls.alternative_values
+            k2 = cls.alternative_keys.get(k2, k2)
+            v = cls.alternative_values.get(v.lower(), v)
             if k2 == "solventatom":
                 v = [int(i) for i in tokens[1:4]]
                 # noinspection PyTypeChecker
@@ -985,18 +1189,19 @@ class QcTask(MSONable):
                     d[k2] = [v]
                 else:
                     d[k2].append(v)
-            elif v == "True":
-                d[k2] = True
-            elif v == "False":
-                d[k2] = False
-            elif int_pattern.match(v):
-                d[k2] = int(v)
-            elif float_pattern.match(v):
-                d[k2] = float(v)
             else:
-                d[k2] = v.lower()
+                d[k2] = _coerce_value(v)
         return d
 
+    _section_parsers = {"comment": _parse_comment.__func__,
+                        "molecule": _parse_molecule.__func__,
+                        "rem": _parse_rem.__func__,
+                        "basis": _parse_basis.__func__,
+                        "aux_basis": _parse_aux_basis.__func__,
+                        "ecp": _parse_ecp.__func__,
+                        "pcm": _parse_pcm.__func__,
+                        "pcm_solvent": _parse_pcm_solvent.__func__}
+
 
 class QcInput(MSONable):
     """
@@ -1017,8 +1222,12 @@ class QcInput(MSONable):
         return "\n@@@\n\n\n".join([str(j) for j in self.jobs])
 
     def write_file(self, filename):
+        # Write job by job rather than joining every job into one string.
         with zopen(filename, "w") as f:
-            f.write(self.__str__())
+            for i, j in enumerate(self.jobs):
+                if i:
+                    f.write("\n@@@\n\n\n")
+                j.write_to(f)
 
     @property
     def to_dict(self):
@@ -1033,8 +1242,8 @@ class QcInput(MSONable):
 
     @classmethod
     def from_string(cls, contents):
-        qc_contents = contents.split("@@@")
-        jobs = [QcTask.from_string(cont) for cont in qc_contents]
+        jobs = [QcTask.from_string(cont)
+                for cont in _iter_split(contents, "@@@")]
         return QcInput(jobs)
 
     @classmethod
@@ -1050,70 +1259,34 @@ class QcOutput(object):
     def __init__(self, filename):
         self.filename = filename
         with zopen(filename) as f:
-            data = f.read()
-        chunks = re.split("\n\nRunning Job \d+ of \d+ \S+", data)
-        self.data = map(self._parse_job, chunks)
+            self.data = [self._parse_job(line for job, line in job_lines)
+                         for job, job_lines in groupby(_iter_job_lines(f),
+                                                       key=itemgetter(0))]
 
     @classmethod
     def _expected_successful_pattern(cls, qctask):
-        text = ["Convergence criterion met"]
+        """
+        Names of the _SUCCESS_MARKERS a successful run of qctask must show.
+        """
+        names = ["scf_converged"]
         if "correlation" in qctask.params["rem"]:
             if "ccsd" in qctask.params["rem"]["correlation"]\
                     or "qcisd" in qctask.params["rem"]["correlation"]:
-                text.append('CC.*converged')
+                names.append("cc_converged")
         if qctask.params["rem"]["jobtype"] == "opt"\
                 or qctask.params["rem"]["jobtype"] == "ts":
-            text.append("OPTIMIZATION CONVERGED")
+            names.append("opt_converged")
         if qctask.params["rem"]["jobtype"] == "freq":
-            text.append("VIBRATIONAL ANALYSIS")
+            names.append("vib_analysis")
         if qctask.params["rem"]["jobtype"] == "gradient":
-            text.append("Gradient of SCF Energy")
-        return text
+            names.append("gradient")
+        return names
 
     @classmethod
-    def _parse_job(cls, output):
-        scf_energy_pattern = re.compile("Total energy in the final basis set ="
-                                        "\s+(?P<energy>-\d+\.\d+)")
-        corr_energy_pattern = re.compile("(?P<name>[A-Z\-\(\)0-9]+)\s+"
-                                         "([tT]otal\s+)?[eE]nergy\s+=\s+"
-                                         "(?P<energy>-\d+\.\d+)")
-        coord_pattern = re.compile("\s*\d+\s+(?P<element>[A-Z][a-z]*)\s+"
-                                   "(?P<x>\-?\d+\.\d+)\s+"
-                                   "(?P<y>\-?\d+\.\d+)\s+"
-                                   "(?P<z>\-?\d+\.\d+)")
-        num_ele_pattern = re.compile("There are\s+(?P<alpha>\d+)\s+alpha "
-                                     "and\s+(?P<beta>\d+)\s+beta electrons")
-        total_charge_pattern = re.compile("Sum of atomic charges ="
-                                          "\s+(?P<charge>\-?\d+\.\d+)")
-        scf_iter_pattern = re.compile("\d+\s+(?P<energy>\-\d+\.\d+)\s+"
-                                      "(?P<diis_error>\d+\.\d+E[-+]\d+)")
-        zpe_pattern = re.compile("Zero point vibrational energy:"
-                                 "\s+(?P<zpe>\d+\.\d+)\s+kcal/mol")
-        thermal_corr_pattern = re.compile("(?P<name>\S.*\S):\s+"
-                                          "(?P<correction>\d+\.\d+)\s+"
-                                          "k?cal/mol")
-        detailed_charge_pattern = re.compile("Ground-State (?P<method>\w+) Net"
-                                             " Atomic Charges")
-
-        error_defs = (
-            (re.compile("Convergence failure"), "Bad SCF convergence"),
-            (re.compile("Coordinates do not transform within specified "
-                        "threshold"), "autoz error"),
-            (re.compile("MAXIMUM OPTIMIZATION CYCLES REACHED"),
-                "Geometry optimization failed"),
-            (re.compile("\s+[Nn][Aa][Nn]\s+"), "NAN values"),
-            (re.compile("energy\s+=\s*(\*)+"), "Numerical disaster"),
-            (re.compile("NewFileMan::OpenFile\(\):\s+nopenfiles=\d+\s+"
-                        "maxopenfiles=\d+s+errno=\d+"), "Open file error"),
-            (re.compile("Application \d+ exit codes: 1[34]\d+"), "Exit Code 134"),
-            (re.compile("Negative overlap matrix eigenvalue. Tighten integral "
-                        "threshold \(REM_THRESH\)!"), "Negative Eigen"),
-            (re.compile("Unable to allocate requested memory in mega_alloc"),
-                "Insufficient static memory"),
-            (re.compile("Application \d+ exit signals: Killed"),
-                "Killed")
-        )
-
+    def _parse_job(cls, lines):
+        regex_error_screen = _REGEX_ERROR_SCREEN.search
+        markers_left = _SUCCESS_MARKERS
+        markers_seen = set()
         energies = []
         scf_iters = []
         coords = []
@@ -1143,10 +1316,19 @@ class QcOutput(object):
         charges = dict()
         scf_successful = False
         opt_successful = False
-        for line in output.split("\n"):
-            for ep, message in error_defs:
-                if ep.search(line):
+        for line in lines:
+            for name, marker_found in markers_left:
+                if marker_found(line):
+                    markers_seen.add(name)
+                    markers_left = tuple(m for m in markers_left
+                                         if m[0] not in markers_seen)
+            for text, message in _LITERAL_ERRORS:
+                if text in line:
                     errors.append(message)
+            if regex_error_screen(line):
+                for ep, message in _REGEX_ERRORS:
+                    if ep.search(line):
+                        errors.append(message)
             if parse_input:
                 if "-" * 50 in line:
                     if len(qctask_lines) == 0:
@@ -1169,7 +1351,7 @@ class QcOutput(object):
                         continue
                 if "Atom" in line:
                     continue
-                m = coord_pattern.match(line)
+                m = _OUT_COORD_PATT.match(line)
                 coords.append([float(m.group("x")), float(m.group("y")),
                               float(m.group("z"))])
                 species.append(m.group("element"))
@@ -1179,7 +1361,7 @@ class QcOutput(object):
                     continue
                 if 'Convergence criterion met' in line:
                     scf_successful = True
-                m = scf_iter_pattern.search(line)
+                m = _SCF_ITER_PATT.search(line)
                 if m:
                     scf_iters[-1].append((float(m.group("energy")),
                                           float(m.group("diis_error"))))
@@ -1207,32 +1389,40 @@ class QcOutput(object):
                             raise Exception("Gradient section parsing failed")
                     grad_comp = []
                 else:
-                    grad_line_token = list(line)
-                    grad_crowd = False
                     grad_line_final = line
-                    for i in range(5, len(line), 12):
-                        c = grad_line_token[i]
-                        if not c.isspace():
-                            grad_crowd = True
-                            if ' ' in grad_line_token[i+1: i+6+1] or \
-                                    len(grad_line_token[i+1: i+6+1]) < 6:
-                                continue
-                            grad_line_token[i-1] = ' '
-                    if grad_crowd:
+                    # Only lines with a character at a column boundary can
+                    # have crowded fields, and one slice finds them.
+                    if line[5::12].strip():
+                        grad_line_token = list(line)
+                        for i in range(5, len(line), 12):
+                            if not grad_line_token[i].isspace():
+                                if ' ' in grad_line_token[i+1: i+6+1] or \
+                                        len(grad_line_token[i+1: i+6+1]) < 6:
+                                    continue
+                                grad_line_token[i-1] = ' '
                         grad_line_final = ''.join(grad_line_token)
                     grad_comp.append([float(x) for x
-                                      in grad_line_final.strip().split()[1:]])
+                                      in grad_line_final.split()[1:]])
             elif parse_freq:
                 if parse_modes:
                     if "TransDip" in line:
                         parse_modes = False
-                        for freq, mode in zip(vib_freqs, zip(*vib_modes)):
-                            freqs.append({"frequency": freq,
-                                          "vib_mode": mode})
+                        if vib_modes:
+                            # Rows are atoms and columns modes, truncated
+                            # to the atom with the fewest modes.
+                            num_modes = min(len(m) for m in vib_modes)
+                            modes = np.array([m[:num_modes]
+                                              for m in vib_modes])
+                            for freq, mode in zip(
+                                    vib_freqs,
+                                    modes.transpose(1, 0, 2).tolist()):
+                                freqs.append({"frequency": freq,
+                                              "vib_mode": tuple(
+                                                  tuple(dis) for dis
+                                                  in mode)})
                         continue
-                    dis_flat = [float(x) for x in line.strip().split()[1:]]
-                    dis_atom = zip(*([iter(dis_flat)]*3))
-                    vib_modes.append(dis_atom)
+                    vib_modes.append(np.array(line.split()[1:],
+                                              dtype=np.float64).reshape(-1, 3))
                 if "STANDARD THERMODYNAMIC QUANTITIES" in line\
                         or "Imaginary Frequencies" in line:
                     parse_freq = False
@@ -1258,34 +1448,34 @@ class QcOutput(object):
                         charges[pop_method].append(float(line.split()[2]))
             else:
                 if spin_multiplicity is None:
-                    m = num_ele_pattern.search(line)
+                    m = _NUM_ELE_PATT.search(line)
                     if m:
                         spin_multiplicity = int(m.group("alpha")) - \
                             int(m.group("beta")) + 1
                 if charge is None:
-                    m = total_charge_pattern.search(line)
+                    m = _TOTAL_CHARGE_PATT.search(line)
                     if m:
                         charge = int(float(m.group("charge")))
                 if jobtype and jobtype == "freq":
-                    m = zpe_pattern.search(line)
+                    m = _ZPE_PATT.search(line)
                     if m:
                         zpe = float(m.group("zpe"))
                         thermal_corr["ZPE"] = zpe
-                    m = thermal_corr_pattern.search(line)
+                    m = _THERMAL_CORR_PATT.search(line)
                     if m:
                         thermal_corr[m.group("name")] = \
                             float(m.group("correction"))
                 name = None
                 energy = None
-                m = scf_energy_pattern.search(line)
+                m = _SCF_ENERGY_PATT.search(line)
                 if m:
                     name = "SCF"
                     energy = Energy(m.group("energy"), "Ha").to("eV")
-                m = corr_energy_pattern.search(line)
+                m = _CORR_ENERGY_PATT.search(line)
                 if m and m.group("name") != "SCF":
                     name = m.group("name")
                     energy = Energy(m.group("energy"), "Ha").to("eV")
-                m = detailed_charge_pattern.search(line)
+                m = _DETAILED_CHARGE_PATT.search(line)
                 if m:
                     pop_method = m.group("method").lower()
                     parse_charge = True
@@ -1342,9 +1532,8 @@ class QcOutput(object):
                     errors.append('Geometry optimization failed')
 
         if len(errors) == 0:
-            for text in cls._expected_successful_pattern(qctask):
-                success_pattern = re.compile(text)
-                if not success_pattern.search(output):
+            for name in cls._expected_successful_pattern(qctask):
+                if name not in markers_seen:
                     errors.append("Can't find text to indicate success")
 
         data = {
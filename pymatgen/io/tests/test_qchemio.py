@@ -1,6 +1,7 @@
 import glob
 import json
 import os
+import tempfile
 from unittest import TestCase
 import unittest
 from pymatgen import Molecule
@@ -108,6 +109,52 @@ $end
             for t1, t2 in zip(xyz1, xyz2):
                 self.assertTrue(abs(float(t1)-float(t2)) < 0.0001)
 
+    def test_read_alternative_keys_and_values(self):
+        contents = '''$molecule
+ 0 1
+ H   0.0 0.0 0.0
+ H   0.0 0.0 0.74
+$end
+
+$rem
+   job_type = Optimization
+   exchange = hf
+      basis = sto-3g
+$end
+
+'''
+        qctask = QcTask.from_string(contents)
+        self.assertEqual(qctask.params["rem"]["jobtype"], "opt")
+        self.assertNotIn("job_type", qctask.params["rem"])
+
+    def test_read_rem_value_types(self):
+        contents = '''$molecule
+ 0 1
+ H   0.0 0.0 0.0
+ H   0.0 0.0 0.74
+$end
+
+$rem
+         jobtype = sp
+        exchange = hf
+           basis = sto-3g
+  max_scf_cycles = 100
+     scf_damping = 0.5
+  symmetry_ignore = True
+    user_value_1 = 5.
+    user_value_2 = .5
+    user_value_3 = 1_0
+$end
+
+'''
+        rem = QcTask.from_string(contents).params["rem"]
+        self.assertEqual(rem["max_scf_cycles"], 100)
+        self.assertEqual(rem["scf_damping"], 0.5)
+        self.assertIs(rem["sym_ignore"], True)
+        self.assertEqual(rem["user_value_1"], "5.")
+        self.assertEqual(rem["user_value_2"], ".5")
+        self.assertEqual(rem["user_value_3"], "1_0")
+
     def test_no_mol(self):
         ans = '''$comment
  Test Methane
@@ -163,6 +210,15 @@ $end
         self.assertEqual(str(qctask), ans)
         self.elementary_io_verify(ans, qctask)
 
+    def test_basis_set_checks_edited_molecule(self):
+        qctask = QcTask(mol, title="Test Methane", exchange="B3LYP",
+                        jobtype="SP", basis_set="6-31+G*")
+        qctask.mol.append("O", [1.0, 1.0, 1.0])
+        self.assertRaisesRegexp(ValueError, "elements O is missing",
+                                qctask.set_basis_set,
+                                {"C": "6-31G*", "H": "6-31g*",
+                                 "Cl": "6-31+g*"})
+
     def test_aux_basis_str(self):
         ans = '''$comment
  Test Methane
@@ -272,6 +328,25 @@ $end
         self.assertEqual(str(qctask), ans)
         self.elementary_io_verify(ans, qctask)
 
+    def test_molecule_is_copied(self):
+        m = Molecule(["H", "H"], [[0.0, 0.0, 0.0], [0.0, 0.0, 0.74]],
+                     site_properties={"vel": [[0, 0, 1], [0, 0, -1]]})
+        qctask = QcTask(m, exchange="B3LYP", basis_set="6-31+G*")
+        m.sites[0].properties["vel"][0] = 99
+        m.translate_sites([1], [0.0, 0.0, 1.0])
+        self.assertEqual(qctask.mol.sites[0].properties["vel"], [0, 0, 1])
+        self.assertAlmostEqual(qctask.mol.cart_coords[1][2], 0.74)
+
+    def test_str_reflects_direct_edits(self):
+        qctask = QcTask(mol, title="Test Methane", exchange="B3LYP",
+                        jobtype="SP", basis_set="6-31+G*")
+        self.assertNotIn("scf_convergence", str(qctask))
+        qctask.params["rem"]["scf_convergence"] = 9
+        self.assertIn("scf_convergence = 9", str(qctask))
+        qctask.charge = 1
+        qctask.spin_multiplicity = 2
+        self.assertIn("\n 1  2\n", str(qctask))
+
     def test_set_memory(self):
         ans = '''$comment
  Test Methane
@@ -784,6 +859,41 @@ $end
         self.assertEqual(str(qctask), ans)
         self.elementary_io_verify(ans, qctask)
 
+    def test_use_pcm_copies_solvent_params(self):
+        rows = ([8, 1, 186, 1.30], (1, 2, 187, 1.01))
+        extra = {"a": 1}
+        qctask = QcTask(mol, exchange="B3LYP", basis_set="6-31+G*")
+        qctask.use_pcm(solvent_params={"Dielectric": 20.0,
+                                       "SolventAtom": rows,
+                                       "Extra": extra})
+        rows[0][0] = 6
+        extra["a"] = 2
+        solvent = qctask.params["pcm_solvent"]
+        self.assertEqual(solvent["solventatom"],
+                         ([8, 1, 186, 1.30], (1, 2, 187, 1.01)))
+        self.assertEqual(solvent["extra"], {"a": 1})
+
+    def test_batch_from_molecules(self):
+        tasks = QcTask.batch_from_molecules([mol, heavy_mol],
+                                            charges=[1, 0],
+                                            spin_multiplicities=[2, 1],
+                                            exchange="B3LYP",
+                                            basis_set="6-31+G*")
+        self.assertEqual([t.charge for t in tasks], [1, 0])
+        self.assertEqual([t.spin_multiplicity for t in tasks], [2, 1])
+        self.assertEqual(tasks[1].params["rem"]["exchange"], "b3lyp")
+        tasks = QcTask.batch_from_molecules([mol, heavy_mol])
+        self.assertEqual([t.spin_multiplicity for t in tasks], [1, 1])
+        self.assertRaisesRegexp(ValueError, "at index 1$",
+                                QcTask.batch_from_molecules,
+                                [mol, heavy_mol], charges=[0, 0],
+                                spin_multiplicities=[1, 2])
+        tasks = QcTask.batch_from_molecules([mol, heavy_mol],
+                                            charges=[None, 0],
+                                            spin_multiplicities=[1, None])
+        self.assertEqual([t.charge for t in tasks], [0, 0])
+        self.assertEqual([t.spin_multiplicity for t in tasks], [1, 1])
+
 
 class TestQcInput(TestCase):
     def test_str_and_from_string(self):
@@ -1197,6 +1307,15 @@ $end
                          (-741.6069065075, 7.38e-09)]]
         self.assertEqual(qcout.data[0]['scf_iteration_energies'], ans_scf_iter)
 
+    def test_compressed_output(self):
+        qcout = QcOutput(os.path.join(test_dir, "CdBr2.qcout"))
+        qcout_bz2 = QcOutput(os.path.join(test_dir, "CdBr2.qcout.bz2"))
+        self.assertEqual(len(qcout_bz2.data), 3)
+        for d1, d2 in zip(qcout.data, qcout_bz2.data):
+            self.assertEqual(d1["jobtype"], d2["jobtype"])
+            self.assertEqual(d1["energies"], d2["energies"])
+            self.assertEqual(d1["errors"], d2["errors"])
+
     def test_multiple_step_job(self):
         filename = os.path.join(test_dir, "CdBr2.qcout")
         qcout = QcOutput(filename)
@@ -1220,7 +1339,7 @@ $end
         ans_thermo_corr = json.loads(ans_thermo_corr_text)
         self.assertEqual(sorted(qcout.data[1]['corrections'].keys()),
                          sorted(ans_thermo_corr.keys()))
-        for k, ref in ans_thermo_corr.iteritems():
+        for k, ref in ans_thermo_corr.items():
             self.assertAlmostEqual(qcout.data[1]['corrections'][k], ref)
         self.assertEqual(len(qcout.data[1]['molecules']), 1)
         ans_mol1 = '''Molecule Summary (Br2 Cd1)
@@ -1336,6 +1455,22 @@ $end
         self.assertEqual(geom_qcout.data[0]['errors'],
                          ['Geometry optimization failed'])
 
+    def test_missing_success_marker(self):
+        filename = os.path.join(test_dir, "qchem_energies",
+                                "hf_ccsd(t).qcout")
+        self.assertFalse(QcOutput(filename).data[0]['has_error'])
+        with open(filename) as f:
+            lines = [l for l in f if "CCSD T converged" not in l]
+        with tempfile.NamedTemporaryFile("w", suffix=".qcout",
+                                         delete=False) as f:
+            f.writelines(lines)
+        try:
+            qcout = QcOutput(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(qcout.data[0]['errors'],
+                         ["Can't find text to indicate success"])
+
     def test_abnormal_exit(self):
         no_reading_file = os.path.join(test_dir, "no_reading.qcout")
         no_reading_qcout = QcOutput(no_reading_file)